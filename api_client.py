@@ -2,20 +2,37 @@
 ACGalaxy API 客户端
 """
 
+import asyncio
+from dataclasses import replace
 from typing import Any, Dict, List, Optional
 
 import httpx
+import msgspec
 from astrbot.api import logger
 
 from .models import (
     ACGEvent,
     ACGListResponse,
+    APIEnvelope,
     APIResponse,
-    Guest,
     GuestACGListResponse,
     GuestListResponse,
+    format_coordinate_url,
 )
 
+# 各接口响应的类型化解码器（模块加载时创建一次）
+_DETAIL_DECODER = msgspec.json.Decoder(APIEnvelope[ACGEvent], strict=False)
+_LIST_DECODER = msgspec.json.Decoder(ACGListResponse, strict=False)
+_GUEST_LIST_DECODER = msgspec.json.Decoder(GuestListResponse, strict=False)
+_GUEST_ACG_DECODER = msgspec.json.Decoder(
+    APIEnvelope[GuestACGListResponse], strict=False
+)
+
+
+def _error_excerpt(content: bytes) -> str:
+    """截取非JSON响应体的开头部分作为错误信息"""
+    return content[:512].decode("utf-8", "replace")
+
 
 class ACGalaxyAPIClient:
     """ACGalaxy API 客户端"""
@@ -23,30 +40,83 @@ class ACGalaxyAPIClient:
     def __init__(self, base_url: str = "https://acg.s1f.ren", timeout: int = 30):
         self.base_url = base_url.rstrip("/")
         self.timeout = timeout
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        """获取复用的HTTP客户端（首次使用时创建）"""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=self.timeout,
+                http2=True,
+                limits=httpx.Limits(max_keepalive_connections=20, max_connections=50),
+            )
+        return self._client
+
+    async def aclose(self):
+        """关闭HTTP客户端"""
+        if self._client is not None and not self._client.is_closed:
+            await self._client.aclose()
+        self._client = None
 
     async def _make_request(
-        self, method: str, endpoint: str, params: Dict[str, Any] = None
+        self,
+        method: str,
+        endpoint: str,
+        params: Dict[str, Any] = None,
+        decoder: Optional[msgspec.json.Decoder] = None,
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None,
     ) -> APIResponse:
-        """发起HTTP请求"""
+        """发起HTTP请求，指定 decoder 时直接将响应体解码为对应模型
+
+        传入 etag/last_modified 时发起条件请求，上游未修改则返回 304 响应
+        """
         url = f"{self.base_url}{endpoint}"
 
+        headers = {}
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+
         try:
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                if method.upper() == "GET":
-                    response = await client.get(url, params=params)
-                elif method.upper() == "POST":
-                    response = await client.post(url, json=params)
-                else:
-                    return APIResponse.error_response(f"不支持的HTTP方法: {method}")
+            client = self._get_client()
+            if method.upper() == "GET":
+                response = await client.get(endpoint, params=params, headers=headers)
+            elif method.upper() == "POST":
+                response = await client.post(
+                    endpoint,
+                    content=msgspec.json.encode(params) if params is not None else None,
+                    headers={"Content-Type": "application/json"},
+                )
+            else:
+                return APIResponse.error_response(f"不支持的HTTP方法: {method}")
 
+            if response.status_code == 304:
+                return APIResponse.not_modified()
+
+            if decoder is not None and response.status_code == 200:
+                try:
+                    result = APIResponse.success_response(
+                        decoder.decode(response.content)
+                    )
+                    result.etag = response.headers.get("etag")
+                    result.last_modified = response.headers.get("last-modified")
+                    return result
+                except msgspec.DecodeError as e:
+                    logger.error(f"ACGalaxy API 响应解析失败: {url}: {e}")
+                    return APIResponse.error_response(f"响应解析失败: {e}", 502)
+
+            if "json" in response.headers.get("content-type", ""):
                 try:
-                    response_data = response.json()
-                except:
-                    response_data = {"error": response.text}
+                    response_data = msgspec.json.decode(response.content)
+                except msgspec.DecodeError:
+                    response_data = {"error": _error_excerpt(response.content)}
+            else:
+                response_data = {"error": _error_excerpt(response.content)}
 
-                return APIResponse.from_http_response(
-                    response.status_code, response_data
-                )
+            return APIResponse.from_http_response(response.status_code, response_data)
 
         except httpx.TimeoutException:
             logger.error(f"ACGalaxy API 请求超时: {url}")
@@ -58,16 +128,26 @@ class ACGalaxyAPIClient:
             logger.error(f"ACGalaxy API 请求异常: {e}")
             return APIResponse.error_response(str(e), 500)
 
-    async def get_acg_info(self, acg_id: str) -> APIResponse:
+    async def get_acg_info(
+        self,
+        acg_id: str,
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None,
+    ) -> APIResponse:
         """获取漫展详细信息"""
         try:
-            response = await self._make_request("GET", f"/detail/{acg_id}")
+            response = await self._make_request(
+                "GET",
+                f"/detail/{acg_id}",
+                decoder=_DETAIL_DECODER,
+                etag=etag,
+                last_modified=last_modified,
+            )
 
-            if response.success and response.data:
-                event_data = response.data.get("data")
-                if event_data:
-                    event = ACGEvent.from_dict(event_data)
-                    return APIResponse.success_response(event, "获取漫展信息成功")
+            if response.success:
+                event = response.data.data
+                if event:
+                    return replace(response, data=event, message="获取漫展信息成功")
                 else:
                     return APIResponse.error_response("漫展信息不存在", 404)
 
@@ -85,27 +165,36 @@ class ACGalaxyAPIClient:
         order: Optional[str] = None,
         page: Optional[int] = None,
         count: Optional[int] = None,
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None,
     ) -> APIResponse:
         """获取漫展列表"""
         try:
-            params = {"city_id": city_id}
-
-            if city_name:
-                params["city_name"] = city_name
-            if key:
-                params["key"] = key
-            if order:
-                params["order"] = order
-            if page:
-                params["page"] = page
-            if count:
-                params["count"] = count
+            # city_id 始终传递（0 表示全部城市），其余参数为空时省略
+            params = {
+                k: v
+                for k, v in (
+                    ("city_id", city_id),
+                    ("city_name", city_name),
+                    ("key", key),
+                    ("order", order),
+                    ("page", page),
+                    ("count", count),
+                )
+                if v or k == "city_id"
+            }
 
-            response = await self._make_request("GET", "/list", params)
+            response = await self._make_request(
+                "GET",
+                "/list",
+                params,
+                decoder=_LIST_DECODER,
+                etag=etag,
+                last_modified=last_modified,
+            )
 
-            if response.success and response.data:
-                acg_list = ACGListResponse.from_dict(response.data)
-                return APIResponse.success_response(acg_list, "获取漫展列表成功")
+            if response.success:
+                return replace(response, message="获取漫展列表成功")
 
             return response
 
@@ -117,11 +206,12 @@ class ACGalaxyAPIClient:
         """获取嘉宾列表"""
         try:
             params = {"guest_name": guest_name}
-            response = await self._make_request("GET", "/guests", params)
+            response = await self._make_request(
+                "GET", "/guests", params, decoder=_GUEST_LIST_DECODER
+            )
 
-            if response.success and response.data:
-                guest_list = GuestListResponse.from_dict(response.data)
-                return APIResponse.success_response(guest_list, "获取嘉宾列表成功")
+            if response.success:
+                return APIResponse.success_response(response.data, "获取嘉宾列表成功")
 
             return response
 
@@ -132,10 +222,12 @@ class ACGalaxyAPIClient:
     async def get_guest_acg_list(self, guest_id: str) -> APIResponse:
         """获取嘉宾相关漫展列表"""
         try:
-            response = await self._make_request("GET", f"/guest/{guest_id}")
+            response = await self._make_request(
+                "GET", f"/guest/{guest_id}", decoder=_GUEST_ACG_DECODER
+            )
 
-            if response.success and response.data:
-                guest_acg_list = GuestACGListResponse.from_dict(response.data)
+            if response.success:
+                guest_acg_list = response.data.data or GuestACGListResponse()
                 return APIResponse.success_response(
                     guest_acg_list, "获取嘉宾相关漫展成功"
                 )
@@ -146,15 +238,33 @@ class ACGalaxyAPIClient:
             logger.error(f"获取嘉宾相关漫展失败: {e}")
             return APIResponse.error_response(f"获取嘉宾相关漫展失败: {e}")
 
-    async def search_acg_events(self, keyword: str, count: int = 100) -> APIResponse:
+    async def search_acg_events(
+        self,
+        keyword: str,
+        count: int = 100,
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None,
+    ) -> APIResponse:
         """搜索漫展活动"""
-        return await self.get_acg_list(key=keyword, count=count)
+        return await self.get_acg_list(
+            key=keyword, count=count, etag=etag, last_modified=last_modified
+        )
 
     async def get_city_acg_calendar(
-        self, city_name: str, count: int = 100
+        self,
+        city_name: str,
+        count: int = 100,
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None,
     ) -> APIResponse:
         """获取城市漫展日历（按时间排序）"""
-        return await self.get_acg_list(city_name=city_name, count=count, order="time")
+        return await self.get_acg_list(
+            city_name=city_name,
+            count=count,
+            order="time",
+            etag=etag,
+            last_modified=last_modified,
+        )
 
     async def search_guest_events(self, guest_name: str) -> APIResponse:
         """搜索嘉宾相关漫展"""
@@ -169,21 +279,27 @@ class ACGalaxyAPIClient:
                 return APIResponse.error_response("未找到相关嘉宾信息", 404)
 
             # 获取所有嘉宾的相关漫展
-            all_events = []
-            for guest in guest_list.data:
-                acg_response = await self.get_guest_acg_list(guest.id)
+            responses = await asyncio.gather(
+                *(self.get_guest_acg_list(guest.id) for guest in guest_list.data),
+                return_exceptions=True,
+            )
+
+            # 按嘉宾ID分组保存活动，避免逐条复制字典
+            events_by_guest_id: Dict[str, List[ACGEvent]] = {}
+            for guest, acg_response in zip(guest_list.data, responses):
+                if isinstance(acg_response, Exception):
+                    logger.warning(f"获取嘉宾 {guest.id} 相关漫展失败: {acg_response}")
+                    continue
                 if acg_response.success:
-                    guest_acg_data = acg_response.data
-                    # 为每个活动添加嘉宾信息
-                    for event in guest_acg_data.projects:
-                        event_dict = event.__dict__.copy()
-                        event_dict["guest"] = guest
-                        all_events.append(event_dict)
+                    projects = acg_response.data.projects
+                    events_by_guest_id.setdefault(guest.id, []).extend(projects)
 
             result_data = {
                 "guests": guest_list.data,
-                "events": all_events,
-                "total_count": len(all_events),
+                "events_by_guest_id": events_by_guest_id,
+                "total_count": sum(
+                    len(events) for events in events_by_guest_id.values()
+                ),
             }
 
             return APIResponse.success_response(result_data, "搜索嘉宾相关漫展成功")
@@ -194,9 +310,7 @@ class ACGalaxyAPIClient:
 
     def get_coordinate_url(self, coordinate: str) -> str:
         """获取坐标对应的高德地图URL"""
-        if not coordinate:
-            return ""
-        return f"https://uri.amap.com/marker?position={coordinate}"
+        return format_coordinate_url(coordinate)
 
     async def test_connection(self) -> APIResponse:
         """测试API连接"""
@@ -1,15 +1,29 @@
 import asyncio
+import hashlib
+import io
 import time
-from typing import Any, Dict, List, Optional
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Coroutine, Dict, Optional, Set, Tuple
 
 import astrbot.api.message_components as Comp
+import msgspec
+from cachetools import LRUCache, TLRUCache
 from astrbot.api import AstrBotConfig, logger
 from astrbot.api.event import AstrMessageEvent, filter
-from astrbot.api.star import Context, Star, register
+from astrbot.api.star import Context, Star, StarTools, register
 
 from .api_client import get_api_client, init_api_client
-from .models import ACGEvent, APIResponse, Guest, SearchResult, TimeGroupedEvents
-from .renderer import ACGalaxyImageRenderer
+from .models import (
+    ACGEvent,
+    ACGListResponse,
+    APIResponse,
+    CacheSnapshot,
+    TimeGroupedEvents,
+)
+
+PLUGIN_NAME = "astrbot_plugin_acgalaxy"
+# 缓存快照文件，插件重载后用于恢复缓存
+CACHE_SNAPSHOT_FILE = "acgalaxy_cache.msgpack"
 
 
 @register(
@@ -23,44 +37,240 @@ class ACGalaxyPlugin(Star):
     def __init__(self, context: Context, config: AstrBotConfig):
         super().__init__(context)
         self.config = config
+        # 图片渲染器在首次渲染时创建，避免加载插件时导入 playwright
+        self._renderer = None
+        # API 客户端与渲染器的当前设置，变化时由 reload_config 重建
+        self._api_settings: Optional[Tuple[str, int]] = None
+        self._render_settings: Optional[Tuple[int, float, int]] = None
+        # 配置变更后待关闭的旧客户端、旧渲染器
+        self._closing_tasks: Set[asyncio.Task] = set()
+        self.reload_config()
+
+        # 缓存值为 (数据, 写入时间)，按写入时间计算过期
+        self.cache = TLRUCache(maxsize=256, ttu=self._cache_ttu, timer=time.time)
+        # 正在进行中的请求，相同 key 的并发调用共享同一次请求
+        self._inflight: Dict[str, asyncio.Task] = {}
+        # 渲染结果缓存，key 为渲染输入的哈希
+        self._img_cache = TLRUCache(maxsize=64, ttu=self._cache_ttu, timer=time.time)
+        # 带 ETag/Last-Modified 的最近响应，缓存过期后用于条件请求
+        self._revalidate_cache = LRUCache(maxsize=256)
+        # 缓存快照保存在 AstrBot 的插件数据目录，插件更新或重装后仍然保留
+        self._snapshot_path: Path = (
+            Path(StarTools.get_data_dir(PLUGIN_NAME)) / CACHE_SNAPSHOT_FILE
+        )
+        self._load_cache_snapshot()
 
-        # 初始化API客户端
-        api_base_url = self.config.get("api_base_url", "https://acg.s1f.ren")
-        request_timeout = self.config.get("request_timeout", 30)
-        init_api_client(api_base_url, request_timeout)
+        logger.info("ACGalaxy 插件已加载")
 
-        # 初始化图片渲染器
-        image_width = self.config.get("image_width", 625)
-        image_scale_factor = self.config.get("image_scale_factor", 1.0)
-        self.renderer = ACGalaxyImageRenderer(image_width, image_scale_factor)
+    @property
+    def renderer(self):
+        """图片渲染器（延迟创建）"""
+        if self._renderer is None:
+            from .renderer import ACGalaxyImageRenderer
 
-        # 缓存设置
-        self.cache = {}
+            self._renderer = ACGalaxyImageRenderer(
+                self.image_width,
+                self.image_scale_factor,
+                pool_size=self.max_concurrent_renders,
+            )
+        return self._renderer
+
+    def reload_config(self):
+        """读取全部配置项，配置变更后调用以刷新，API 或图片设置变化时重建对应组件"""
+        self.enable_image_render = bool(self.config.get("enable_image_render", True))
+        self.max_results = int(self.config.get("max_results_per_page", 100))
+        self.enable_location = bool(self.config.get("enable_location_service", True))
+        self.enable_guest_search = bool(self.config.get("enable_guest_search", True))
+        self.default_city = self.config.get("default_city", "北京")
+        self.progressive_response = bool(self.config.get("progressive_response", True))
         self.cache_expire_time = (
             self.config.get("cache_expire_time", 30) * 60
         )  # 转换为秒
 
-        logger.info("ACGalaxy 插件已加载")
+        # API 地址或超时变化时重新创建客户端
+        api_settings = (
+            self.config.get("api_base_url", "https://acg.s1f.ren"),
+            self.config.get("request_timeout", 30),
+        )
+        if api_settings != self._api_settings:
+            self._api_settings = api_settings
+            self.api_base_url = api_settings[0]
+            old_client = get_api_client()
+            init_api_client(*api_settings)
+            if old_client is not None:
+                self._close_later(old_client.aclose())
+
+        # 图片设置变化时丢弃已有渲染器，下次渲染时按新设置创建
+        render_settings = (
+            int(self.config.get("image_width", 625)),
+            float(self.config.get("image_scale_factor", 1.0)),
+            max(1, int(self.config.get("max_concurrent_renders", 2))),
+        )
+        if render_settings != self._render_settings:
+            self._render_settings = render_settings
+            (
+                self.image_width,
+                self.image_scale_factor,
+                self.max_concurrent_renders,
+            ) = render_settings
+            # 限制同时进行的图片渲染数量，避免浏览器占用过多内存
+            self._render_sem = asyncio.Semaphore(self.max_concurrent_renders)
+            if self._renderer is not None:
+                self._close_later(self._renderer.close())
+                self._renderer = None
+
+    def _close_later(self, coro: Coroutine[Any, Any, None]):
+        """在后台关闭被替换的旧组件，没有运行中的事件循环时直接丢弃"""
+        try:
+            task = asyncio.get_running_loop().create_task(coro)
+        except RuntimeError:
+            coro.close()
+            return
+        self._closing_tasks.add(task)
+        task.add_done_callback(self._closing_tasks.discard)
+
+    def _cache_ttu(self, _key, value, _now) -> float:
+        """缓存条目的过期时间"""
+        return value[1] + self.cache_expire_time
+
+    def _load_cache_snapshot(self):
+        """从磁盘恢复上次卸载时保存的缓存"""
+        if self.cache_expire_time <= 0 or not self._snapshot_path.exists():
+            return
+
+        try:
+            snapshot = msgspec.msgpack.decode(
+                self._snapshot_path.read_bytes(), type=CacheSnapshot
+            )
+        except (OSError, msgspec.DecodeError) as e:
+            logger.warning(f"加载缓存快照失败: {e}")
+            return
+
+        # 已过期的条目写入时会被直接丢弃
+        for entries in (snapshot.lists, snapshot.events):
+            for key, (data, timestamp) in entries.items():
+                self.cache[key] = (APIResponse.success_response(data), timestamp)
+        for key, entry in snapshot.images.items():
+            self._img_cache[key] = entry
+
+        logger.info(f"已恢复缓存 {len(self.cache)} 条，图片缓存 {len(self._img_cache)} 条")
+
+    def _save_cache_snapshot(self):
+        """将可序列化的缓存条目保存到磁盘"""
+        if self.cache_expire_time <= 0:
+            return
 
-    def get_cached_data(self, key: str):
-        """获取缓存数据"""
-        if key in self.cache:
-            data, timestamp = self.cache[key]
-            if time.time() - timestamp < self.cache_expire_time:
-                return data
-            else:
-                del self.cache[key]
-        return None
-
-    def set_cached_data(self, key: str, data):
-        """设置缓存数据"""
-        self.cache[key] = (data, time.time())
-
-    async def _render_or_text(self, render_func, fallback_text: str, *args, **kwargs):
+        self.cache.expire()
+        self._img_cache.expire()
+
+        snapshot = CacheSnapshot(images=dict(self._img_cache.items()))
+        for key, (response, timestamp) in self.cache.items():
+            if isinstance(response.data, ACGListResponse):
+                snapshot.lists[key] = (response.data, timestamp)
+            elif isinstance(response.data, ACGEvent):
+                snapshot.events[key] = (response.data, timestamp)
+
+        try:
+            self._snapshot_path.parent.mkdir(parents=True, exist_ok=True)
+            self._snapshot_path.write_bytes(msgspec.msgpack.encode(snapshot))
+        except OSError as e:
+            logger.warning(f"保存缓存快照失败: {e}")
+
+    async def _cached_fetch(
+        self,
+        key: str,
+        coro_factory: Callable[[Dict[str, Optional[str]]], Awaitable[APIResponse]],
+    ) -> APIResponse:
+        """带缓存的数据获取，相同 key 的并发请求只会访问一次API
+
+        coro_factory 接收条件请求参数（etag/last_modified），上游返回 304 时
+        继续使用上次的响应数据
+        """
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached[0]
+
+        task = self._inflight.get(key)
+        if task is None:
+            # 请求在独立任务中执行，某个调用方被取消不会影响其他等待者
+            task = asyncio.ensure_future(self._fetch_and_cache(key, coro_factory))
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._finish_inflight(key, t))
+        return await asyncio.shield(task)
+
+    async def _fetch_and_cache(
+        self,
+        key: str,
+        coro_factory: Callable[[Dict[str, Optional[str]]], Awaitable[APIResponse]],
+    ) -> APIResponse:
+        """执行一次API请求并写入缓存"""
+        stale = self._revalidate_cache.get(key)
+        validators = (
+            {"etag": stale.etag, "last_modified": stale.last_modified}
+            if stale is not None
+            else {}
+        )
+        response = await coro_factory(validators)
+        if response.status_code == 304 and stale is not None:
+            response = stale
+        if response.success and self.cache_expire_time > 0:
+            self.cache[key] = (response, time.time())
+            if response.etag or response.last_modified:
+                self._revalidate_cache[key] = response
+        return response
+
+    def _finish_inflight(self, key: str, task: asyncio.Task):
+        """请求结束后移除进行中的记录，并取走异常避免无人等待时的告警"""
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            task.exception()
+
+    def _render_key(self, render_func, *args) -> str:
+        """计算渲染输入的哈希，作为渲染结果缓存的 key"""
+        return hashlib.blake2b(
+            msgspec.json.encode(
+                (
+                    render_func.__name__,
+                    self.image_width,
+                    self.image_scale_factor,
+                    args,
+                )
+            ),
+            digest_size=16,
+        ).hexdigest()
+
+    def _needs_teaser(self, render_key: str) -> bool:
+        """渐进式响应且图片未命中缓存时，需要先发送提示文字"""
+        return self.progressive_response and render_key not in self._img_cache
+
+    async def _render_cached(self, key: str, render_func, *args) -> bytes:
+        """渲染图片，相同输入在缓存有效期内直接复用已生成的图片"""
+        cached = self._img_cache.get(key)
+        if cached is not None:
+            return cached[0]
+
+        async with self._render_sem:
+            img_data = await render_func(*args)
+
+        if self.cache_expire_time > 0:
+            self._img_cache[key] = (img_data, time.time())
+        return img_data
+
+    def _image_chain(
+        self, result_text: str, img_data: bytes, teaser_sent: bool
+    ) -> list:
+        """构建图片消息，已提前发送提示文字时只发送图片"""
+        if teaser_sent:
+            return [Comp.Image.fromBytes(img_data)]
+        return [Comp.Plain(result_text), Comp.Image.fromBytes(img_data)]
+
+    async def _render_or_text(self, render_func, fallback_text: str, *args):
         """尝试渲染图片，失败则返回文本"""
-        if self.config.get("enable_image_render", True):
+        if self.enable_image_render:
             try:
-                img_data = await render_func(*args, **kwargs)
+                key = self._render_key(render_func, *args)
+                img_data = await self._render_cached(key, render_func, *args)
                 return Comp.Image.fromBytes(img_data)
             except Exception as e:
                 logger.error(f"图片渲染失败: {e}")
@@ -73,7 +283,7 @@ class ACGalaxyPlugin(Star):
     ):
         """获取指定城市的漫展日历"""
         if not city:
-            city = self.config.get("default_city", "北京")
+            city = self.default_city
 
         api_client = get_api_client()
         if not api_client:
@@ -81,18 +291,13 @@ class ACGalaxyPlugin(Star):
             return
 
         try:
-            # 尝试从缓存获取
-            cache_key = f"calendar_{city}"
-            cached_data = self.get_cached_data(cache_key)
-
-            if cached_data:
-                response = cached_data
-            else:
-                max_results = self.config.get("max_results_per_page", 100)
-                response = await api_client.get_city_acg_calendar(city, max_results)
-
-                if response.success:
-                    self.set_cached_data(cache_key, response)
+            max_results = self.max_results
+            response = await self._cached_fetch(
+                f"calendar:{city}:{max_results}",
+                lambda validators: api_client.get_city_acg_calendar(
+                    city, max_results, **validators
+                ),
+            )
 
             if not response.success:
                 yield message_event.plain_result(
@@ -109,37 +314,50 @@ class ACGalaxyPlugin(Star):
             time_grouped = TimeGroupedEvents.from_events(acg_list.data)
 
             # 生成图片或文本
-            if self.config.get("enable_image_render", True):
+            teaser_sent = False
+            if self.enable_image_render:
+                render_func = self.renderer.render_acg_calendar
+                render_key = self._render_key(render_func, time_grouped)
+                if self._needs_teaser(render_key):
+                    yield message_event.plain_result(
+                        f"⏳ 正在生成 {city} 漫展日历 (共 {time_grouped.get_total_count()} 场)..."
+                    )
+                    teaser_sent = True
                 try:
-                    img_data = await self.renderer.render_acg_calendar(time_grouped)
+                    img_data = await self._render_cached(
+                        render_key, render_func, time_grouped
+                    )
                     yield message_event.chain_result([Comp.Image.fromBytes(img_data)])
                     return
                 except Exception as e:
                     logger.error(f"生成漫展日历图片失败: {e}")
 
             # 文本格式
-            text_lines = [
-                f"📅 {city} 漫展日历 (共 {time_grouped.get_total_count()} 场)"
-            ]
-
-            for time_key, events in time_grouped.time_groups.items():
-                days_until = time_grouped.get_days_until_start(time_key)
-                if days_until > 0:
-                    text_lines.append(
-                        f"\n🗓️ {time_key} (距离开始 {days_until} 天) - {len(events)} 场"
+            buf = io.StringIO()
+            w = buf.write
+            # 提示文字中已包含标题，渲染失败回退文本时不再重复
+            if not teaser_sent:
+                w(f"📅 {city} 漫展日历 (共 {time_grouped.get_total_count()} 场)")
+
+            for group in time_grouped.time_groups:
+                events = group.events
+                if group.days_until > 0:
+                    w(
+                        f"\n\n🗓️ {group.label} (距离开始 {group.days_until} 天)"
+                        f" - {len(events)} 场"
                     )
                 else:
-                    text_lines.append(f"\n🗓️ {time_key} - {len(events)} 场")
+                    w(f"\n\n🗓️ {group.label} - {len(events)} 场")
 
                 for event in events[:3]:  # 只显示前3个
-                    text_lines.append(f"  • {event.project_name} ({event.venue_name})")
+                    w(f"\n  • {event.project_name or ''} ({event.venue_name or ''})")
 
                 if len(events) > 3:
-                    text_lines.append(f"  ... 还有 {len(events) - 3} 场")
+                    w(f"\n  ... 还有 {len(events) - 3} 场")
 
-            text_lines.append(f"\n💡 发送 '漫展详情 <ID>' 查看详细信息")
+            w("\n\n💡 发送 '漫展详情 <ID>' 查看详细信息")
 
-            yield message_event.plain_result("\n".join(text_lines))
+            yield message_event.plain_result(buf.getvalue().lstrip("\n"))
 
         except Exception as e:
             logger.error(f"获取漫展日历失败: {e}")
@@ -162,7 +380,10 @@ class ACGalaxyPlugin(Star):
             return
 
         try:
-            response = await api_client.get_acg_info(acg_id)
+            response = await self._cached_fetch(
+                f"info:{acg_id}",
+                lambda validators: api_client.get_acg_info(acg_id, **validators),
+            )
 
             if not response.success:
                 yield message_event.plain_result(
@@ -174,15 +395,12 @@ class ACGalaxyPlugin(Star):
 
             text_lines = [
                 f"📍 漫展位置信息",
-                f"漫展名称: {event_info.project_name}",
-                f"漫展地点: {event_info.venue_name}",
-                f"所在城市: {event_info.city}",
+                f"漫展名称: {event_info.project_name or ''}",
+                f"漫展地点: {event_info.venue_name or ''}",
+                f"所在城市: {event_info.city or ''}",
             ]
 
-            if (
-                self.config.get("enable_location_service", True)
-                and event_info.coordinate
-            ):
+            if self.enable_location and event_info.coordinate:
                 amap_url = api_client.get_coordinate_url(event_info.coordinate)
                 text_lines.append(f"地图位置: {amap_url}")
 
@@ -207,7 +425,10 @@ class ACGalaxyPlugin(Star):
             return
 
         try:
-            response = await api_client.get_acg_info(acg_id)
+            response = await self._cached_fetch(
+                f"info:{acg_id}",
+                lambda validators: api_client.get_acg_info(acg_id, **validators),
+            )
 
             if not response.success:
                 yield message_event.plain_result(
@@ -221,10 +442,10 @@ class ACGalaxyPlugin(Star):
             text_lines = [
                 f"🎭 漫展详情",
                 f"ID: {event_info.id}",
-                f"名称: {event_info.project_name}",
-                f"地点: {event_info.venue_name}",
-                f"城市: {event_info.city}",
-                f"时间: {event_info.start_time} - {event_info.end_time}",
+                f"名称: {event_info.project_name or ''}",
+                f"地点: {event_info.venue_name or ''}",
+                f"城市: {event_info.city or ''}",
+                f"时间: {event_info.start_time or ''} - {event_info.end_time or ''}",
                 f"票价: {event_info.price_range_yuan}",
                 f"状态: {event_info.status_text}",
                 f"NPC招募: {event_info.has_npc_text}",
@@ -268,8 +489,13 @@ class ACGalaxyPlugin(Star):
             return
 
         try:
-            max_results = self.config.get("max_results_per_page", 100)
-            response = await api_client.search_acg_events(keyword, max_results)
+            max_results = self.max_results
+            response = await self._cached_fetch(
+                f"search:{keyword}:{max_results}",
+                lambda validators: api_client.search_acg_events(
+                    keyword, max_results, **validators
+                ),
+            )
 
             if not response.success:
                 yield message_event.plain_result(f"❌ 搜索漫展失败: {response.message}")
@@ -283,35 +509,46 @@ class ACGalaxyPlugin(Star):
                 return
 
             # 生成图片或文本
-            if self.config.get("enable_image_render", True):
+            teaser_sent = False
+            if self.enable_image_render:
+                result_text = f"🔍 找到 {acg_list.count} 场相关漫展"
+                render_func = self.renderer.render_acg_list
+                render_key = self._render_key(render_func, acg_list.data)
+                if self._needs_teaser(render_key):
+                    yield message_event.plain_result(f"{result_text}，正在生成图片...")
+                    teaser_sent = True
                 try:
-                    img_data = await self.renderer.render_acg_list(acg_list.data)
-                    result_text = f"🔍 找到 {acg_list.count} 场相关漫展"
+                    img_data = await self._render_cached(
+                        render_key, render_func, acg_list.data
+                    )
                     yield message_event.chain_result(
-                        [Comp.Plain(result_text), Comp.Image.fromBytes(img_data)]
+                        self._image_chain(result_text, img_data, teaser_sent)
                     )
                     return
                 except Exception as e:
                     logger.error(f"生成搜索结果图片失败: {e}")
 
             # 文本格式
-            text_lines = [f"🔍 找到 {acg_list.count} 场相关漫展"]
+            buf = io.StringIO()
+            w = buf.write
+            if not teaser_sent:
+                w(f"🔍 找到 {acg_list.count} 场相关漫展")
 
             for i, acg_event in enumerate(acg_list.data[:5]):  # 只显示前5个
-                text_lines.append(f"\n{i+1}. {acg_event.project_name}")
-                text_lines.append(
-                    f"   📅 {acg_event.start_time} - {acg_event.end_time}"
+                w(
+                    f"\n\n{i+1}. {acg_event.project_name or ''}"
+                    f"\n   📅 {acg_event.start_time or ''} - {acg_event.end_time or ''}"
+                    f"\n   📍 {acg_event.city or ''} - {acg_event.venue_name or ''}"
+                    f"\n   💰 {acg_event.price_range_yuan}"
+                    f"\n   ID: {acg_event.id}"
                 )
-                text_lines.append(f"   📍 {acg_event.city} - {acg_event.venue_name}")
-                text_lines.append(f"   💰 {acg_event.price_range_yuan}")
-                text_lines.append(f"   ID: {acg_event.id}")
 
             if acg_list.count > 5:
-                text_lines.append(f"\n... 还有 {acg_list.count - 5} 场漫展")
+                w(f"\n\n... 还有 {acg_list.count - 5} 场漫展")
 
-            text_lines.append(f"\n💡 发送 '漫展详情 <ID>' 查看详细信息")
+            w("\n\n💡 发送 '漫展详情 <ID>' 查看详细信息")
 
-            yield message_event.plain_result("\n".join(text_lines))
+            yield message_event.plain_result(buf.getvalue().lstrip("\n"))
 
         except Exception as e:
             logger.error(f"搜索漫展失败: {e}")
@@ -322,7 +559,7 @@ class ACGalaxyPlugin(Star):
         self, message_event: AstrMessageEvent, guest_name: str = ""
     ):
         """检索嘉宾信息"""
-        if not self.config.get("enable_guest_search", True):
+        if not self.enable_guest_search:
             yield message_event.plain_result("❌ 嘉宾搜索功能已禁用")
             return
 
@@ -342,7 +579,10 @@ class ACGalaxyPlugin(Star):
             return
 
         try:
-            response = await api_client.search_guest_events(guest_name)
+            response = await self._cached_fetch(
+                f"guest:{guest_name}",
+                lambda _validators: api_client.search_guest_events(guest_name),
+            )
 
             if not response.success:
                 yield message_event.plain_result(f"❌ 搜索嘉宾失败: {response.message}")
@@ -350,7 +590,7 @@ class ACGalaxyPlugin(Star):
 
             result_data = response.data
             guests = result_data["guests"]
-            events = result_data["events"]
+            events_by_guest_id = result_data["events_by_guest_id"]
             total_count = result_data["total_count"]
 
             if not guests:
@@ -364,44 +604,49 @@ class ACGalaxyPlugin(Star):
                 return
 
             # 生成图片或文本
-            if self.config.get("enable_image_render", True):
+            teaser_sent = False
+            if self.enable_image_render:
+                result_text = (
+                    f"🔍 找到相关嘉宾 {len(guests)} 位，相关漫展 {total_count} 场"
+                )
+                render_func = self.renderer.render_guest_events
+                render_key = self._render_key(render_func, guests, events_by_guest_id)
+                if self._needs_teaser(render_key):
+                    yield message_event.plain_result(f"{result_text}，正在生成图片...")
+                    teaser_sent = True
                 try:
-                    img_data = await self.renderer.render_guest_events(guests, events)
-                    result_text = (
-                        f"🔍 找到相关嘉宾 {len(guests)} 位，相关漫展 {total_count} 场"
+                    img_data = await self._render_cached(
+                        render_key, render_func, guests, events_by_guest_id
                     )
                     yield message_event.chain_result(
-                        [Comp.Plain(result_text), Comp.Image.fromBytes(img_data)]
+                        self._image_chain(result_text, img_data, teaser_sent)
                     )
                     return
                 except Exception as e:
                     logger.error(f"生成嘉宾搜索结果图片失败: {e}")
 
             # 文本格式
-            text_lines = [
-                f"🔍 找到相关嘉宾 {len(guests)} 位，相关漫展 {total_count} 场"
-            ]
+            buf = io.StringIO()
+            w = buf.write
+            if not teaser_sent:
+                w(f"🔍 找到相关嘉宾 {len(guests)} 位，相关漫展 {total_count} 场")
 
             for guest in guests:
-                text_lines.append(f"\n👤 {guest.name}")
+                w(f"\n\n👤 {guest.name or ''}")
                 if guest.description:
-                    text_lines.append(f"   {guest.description}")
+                    w(f"\n   {guest.description}")
 
                 # 显示该嘉宾的相关漫展
-                guest_events = [
-                    e for e in events if e.get("guest", {}).get("id") == guest.id
-                ]
+                guest_events = events_by_guest_id.get(guest.id, ())
                 for guest_event in guest_events[:3]:  # 只显示前3个
-                    text_lines.append(
-                        f"   • {guest_event['project_name']} (ID: {guest_event['id']})"
-                    )
+                    w(f"\n   • {guest_event.project_name or ''} (ID: {guest_event.id})")
 
                 if len(guest_events) > 3:
-                    text_lines.append(f"   ... 还有 {len(guest_events) - 3} 场漫展")
+                    w(f"\n   ... 还有 {len(guest_events) - 3} 场漫展")
 
-            text_lines.append(f"\n💡 发送 '漫展详情 <ID>' 查看详细信息")
+            w("\n\n💡 发送 '漫展详情 <ID>' 查看详细信息")
 
-            yield message_event.plain_result("\n".join(text_lines))
+            yield message_event.plain_result(buf.getvalue().lstrip("\n"))
 
         except Exception as e:
             logger.error(f"搜索嘉宾失败: {e}")
@@ -417,8 +662,6 @@ class ACGalaxyPlugin(Star):
             # 测试连接并记录响应时间
             response_time = "未知"
             if api_client:
-                import time
-
                 start_time = time.time()
                 test_result = await api_client.test_connection()
                 response_time = f"{(time.time() - start_time) * 1000:.0f}ms"
@@ -431,13 +674,13 @@ class ACGalaxyPlugin(Star):
             status_text = f"""📊 ACGalaxy 插件状态
 🔗 API连接: {connection_status}
 ⏱️ 响应时间: {response_time}
-🌐 API地址: {self.config.get('api_base_url', 'https://acg.s1f.ren')}
-🖼️ 图片渲染: {'✅ 启用' if self.config.get('enable_image_render', True) else '❌ 禁用'}
-👤 嘉宾搜索: {'✅ 启用' if self.config.get('enable_guest_search', True) else '❌ 禁用'}
-📍 位置服务: {'✅ 启用' if self.config.get('enable_location_service', True) else '❌ 禁用'}
+🌐 API地址: {self.api_base_url}
+🖼️ 图片渲染: {'✅ 启用' if self.enable_image_render else '❌ 禁用'}
+👤 嘉宾搜索: {'✅ 启用' if self.enable_guest_search else '❌ 禁用'}
+📍 位置服务: {'✅ 启用' if self.enable_location else '❌ 禁用'}
 📋 缓存数量: {len(self.cache)}
 ⏰ 缓存过期: {self.cache_expire_time // 60}分钟
-🏙️ 默认城市: {self.config.get('default_city', '北京')}"""
+🏙️ 默认城市: {self.default_city}"""
 
             yield message_event.plain_result(status_text)
 
@@ -447,6 +690,20 @@ class ACGalaxyPlugin(Star):
 
     async def terminate(self):
         """插件卸载时的清理工作"""
+        self._save_cache_snapshot()
         self.cache.clear()
-        logger.info("ACGalaxy 插件已卸载")
+        self._img_cache.clear()
+        self._revalidate_cache.clear()
+
+        for task in self._inflight.values():
+            task.cancel()
+        self._inflight.clear()
+
+        if self._closing_tasks:
+            await asyncio.gather(*self._closing_tasks, return_exceptions=True)
+        api_client = get_api_client()
+        if api_client:
+            await api_client.aclose()
+        if self._renderer is not None:
+            await self._renderer.close()
         logger.info("ACGalaxy 插件已卸载")
@@ -1,51 +1,86 @@
 """
 ACGalaxy 数据模型定义
 """
+import math
 import time
 from datetime import datetime, timedelta
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Final, Generic, Tuple, TypeVar, Union
+from collections import defaultdict
 from dataclasses import dataclass
+from functools import lru_cache
+from urllib.parse import quote
 
+import msgspec
 
-@dataclass
-class ACGEvent:
+
+T = TypeVar("T")
+
+_AMAP_PREFIX = "https://uri.amap.com/marker?position="
+
+# 按日期分组时使用的时区偏移（北京时间），以及进行中、日期待定活动的分组 key
+_TZ_OFFSET: Final[int] = 8 * 3600
+_ONGOING_DAY: Final[int] = -1
+_UNDATED_DAY: Final[int] = 1 << 62  # 排在所有日期之后
+_EPOCH_ORDINAL: Final[int] = datetime(1970, 1, 1).toordinal()
+
+# HTTP状态码对应的错误信息
+_ERROR_MAP: Final[Dict[int, str]] = {
+    400: "请求参数错误",
+    404: "资源不存在",
+    500: "服务器内部错误",
+    502: "网关错误",
+    503: "服务不可用",
+    504: "网关超时",
+}
+
+
+def _to_number(value: Union[int, float, str, None]) -> Union[int, float]:
+    """将上游返回的数值统一为数字，null、空字符串或无法解析的值视为 0"""
+    if isinstance(value, str):
+        try:
+            value = float(value) if "." in value else int(value)
+        except ValueError:
+            return 0
+    if value is None or not math.isfinite(value):
+        return 0
+    return value
+
+
+class ACGEvent(msgspec.Struct):
     """漫展活动信息"""
-    id: str
-    project_name: str
-    start_time: str
-    end_time: str
-    start_unix: int
-    end_unix: int
-    city: str
-    venue_name: str
-    min_price: int  # 价格单位：分
-    max_price: int  # 价格单位：分
-    like_count: int
-    has_npc: int  # 0: 无NPC招募, 1: 有NPC招募
+    id: Union[str, int] = ""
+    # 文本字段上游可能返回 null，展示时需要自行兜底
+    project_name: Optional[str] = ""
+    start_time: Optional[str] = ""
+    end_time: Optional[str] = ""
+    # 数值字段上游可能返回 null、小数或字符串，在 __post_init__ 中统一为数字
+    start_unix: Union[int, float, str, None] = 0
+    end_unix: Union[int, float, str, None] = 0
+    city: Optional[str] = ""
+    venue_name: Optional[str] = ""
+    min_price: Union[int, float, str, None] = 0  # 价格单位：分
+    max_price: Union[int, float, str, None] = 0  # 价格单位：分
+    like_count: Union[int, float, str, None] = 0
+    has_npc: Union[int, float, str, None] = 0  # 0: 无NPC招募, 1: 有NPC招募
     cover: Optional[str] = None
     coordinate: Optional[str] = None
     description: Optional[str] = None
     
+    def __post_init__(self):
+        # 上游ID可能为数字，统一为字符串
+        if not isinstance(self.id, str):
+            self.id = str(self.id)
+        self.start_unix = int(_to_number(self.start_unix))
+        self.end_unix = int(_to_number(self.end_unix))
+        self.min_price = _to_number(self.min_price)
+        self.max_price = _to_number(self.max_price)
+        self.like_count = int(_to_number(self.like_count))
+        self.has_npc = int(_to_number(self.has_npc))
+    
     @classmethod
     def from_dict(cls, data: Dict[str, Any]) -> 'ACGEvent':
         """从字典创建漫展活动信息"""
-        return cls(
-            id=str(data.get("id", "")),
-            project_name=data.get("project_name", ""),
-            start_time=data.get("start_time", ""),
-            end_time=data.get("end_time", ""),
-            start_unix=data.get("start_unix", 0),
-            end_unix=data.get("end_unix", 0),
-            city=data.get("city", ""),
-            venue_name=data.get("venue_name", ""),
-            min_price=data.get("min_price", 0),
-            max_price=data.get("max_price", 0),
-            like_count=data.get("like_count", 0),
-            has_npc=data.get("has_npc", 0),
-            cover=data.get("cover"),
-            coordinate=data.get("coordinate"),
-            description=data.get("description")
-        )
+        return msgspec.convert(data, cls, strict=False)
     
     @property
     def price_range_yuan(self) -> str:
@@ -99,31 +134,26 @@ class ACGEvent:
     @property
     def amap_url(self) -> str:
         """获取高德地图链接"""
-        if self.coordinate:
-            return f"https://uri.amap.com/marker?position={self.coordinate}"
-        return ""
+        return format_coordinate_url(self.coordinate)
 
 
-@dataclass
-class Guest:
+class Guest(msgspec.Struct):
     """嘉宾信息"""
-    id: str
-    name: str
-    description: str
+    id: Union[str, int] = ""
+    name: Optional[str] = ""
+    description: Optional[str] = None
     avatar: Optional[str] = None
     
+    def __post_init__(self):
+        if not isinstance(self.id, str):
+            self.id = str(self.id)
+    
     @classmethod
     def from_dict(cls, data: Dict[str, Any]) -> 'Guest':
         """从字典创建嘉宾信息"""
-        return cls(
-            id=str(data.get("id", "")),
-            name=data.get("name", ""),
-            description=data.get("description", ""),
-            avatar=data.get("avatar")
-        )
+        return msgspec.convert(data, cls, strict=False)
 
 
-@dataclass
 class GuestACGEvent(ACGEvent):
     """带嘉宾信息的漫展活动"""
     guest: Optional[Guest] = None
@@ -131,137 +161,91 @@ class GuestACGEvent(ACGEvent):
     @classmethod
     def from_dict_with_guest(cls, data: Dict[str, Any]) -> 'GuestACGEvent':
         """从字典创建带嘉宾信息的漫展活动"""
-        event = cls(
-            id=str(data.get("id", "")),
-            project_name=data.get("project_name", ""),
-            start_time=data.get("start_time", ""),
-            end_time=data.get("end_time", ""),
-            start_unix=data.get("start_unix", 0),
-            end_unix=data.get("end_unix", 0),
-            city=data.get("city", ""),
-            venue_name=data.get("venue_name", ""),
-            min_price=data.get("min_price", 0),
-            max_price=data.get("max_price", 0),
-            like_count=data.get("like_count", 0),
-            has_npc=data.get("has_npc", 0),
-            cover=data.get("cover"),
-            coordinate=data.get("coordinate"),
-            description=data.get("description")
-        )
-        
-        # 添加嘉宾信息
-        guest_data = data.get("guest")
-        if guest_data:
-            event.guest = Guest.from_dict(guest_data)
-        
-        return event
+        return msgspec.convert(data, cls, strict=False)
+
 
+class APIEnvelope(msgspec.Struct, Generic[T]):
+    """上游API响应外层结构 {"data": ...}"""
+    data: Optional[T] = None
 
-@dataclass
-class ACGListResponse:
+
+class ACGListResponse(msgspec.Struct):
     """漫展列表响应"""
-    count: int
-    data: List[ACGEvent]
+    count: int = 0
+    data: List[ACGEvent] = []
     
     @classmethod
     def from_dict(cls, data: Dict[str, Any]) -> 'ACGListResponse':
         """从字典创建漫展列表响应"""
-        events = []
-        for item in data.get("data", []):
-            events.append(ACGEvent.from_dict(item))
-        
-        return cls(
-            count=data.get("count", 0),
-            data=events
-        )
+        return msgspec.convert(data, cls, strict=False)
 
 
-@dataclass
-class GuestListResponse:
+class GuestListResponse(msgspec.Struct):
     """嘉宾列表响应"""
-    data: List[Guest]
+    data: List[Guest] = []
     
     @classmethod
     def from_dict(cls, data: Dict[str, Any]) -> 'GuestListResponse':
         """从字典创建嘉宾列表响应"""
-        guests = []
-        for item in data.get("data", []):
-            guests.append(Guest.from_dict(item))
-        
-        return cls(data=guests)
+        return msgspec.convert(data, cls, strict=False)
 
 
-@dataclass
-class GuestACGListResponse:
+class GuestACGListResponse(msgspec.Struct):
     """嘉宾相关漫展列表响应"""
-    guest: Guest
-    projects: List[ACGEvent]
+    guest: Guest = msgspec.field(default_factory=Guest)
+    projects: List[ACGEvent] = []
     
     @classmethod
     def from_dict(cls, data: Dict[str, Any]) -> 'GuestACGListResponse':
         """从字典创建嘉宾相关漫展列表响应"""
-        guest_data = data.get("data", {}).get("guest", {})
-        guest = Guest.from_dict(guest_data)
-        
-        projects = []
-        for item in data.get("data", {}).get("projects", []):
-            projects.append(ACGEvent.from_dict(item))
-        
-        return cls(
-            guest=guest,
-            projects=projects
-        )
+        return msgspec.convert(data.get("data") or {}, cls, strict=False)
+
+
+class CacheSnapshot(msgspec.Struct):
+    """缓存快照，值为 (数据, 写入时间)"""
+    lists: Dict[str, Tuple[ACGListResponse, float]] = {}
+    events: Dict[str, Tuple[ACGEvent, float]] = {}
+    images: Dict[str, Tuple[bytes, float]] = {}
+
+
+@dataclass(slots=True)
+class TimeGroup:
+    """同一天开始（或正在进行）的漫展活动"""
+    label: str
+    days_until: int
+    events: List[ACGEvent]
 
 
-@dataclass
+@dataclass(slots=True)
 class TimeGroupedEvents:
     """按时间分组的漫展活动"""
-    time_groups: Dict[str, List[ACGEvent]]
+    time_groups: List[TimeGroup]
     
     @classmethod
     def from_events(cls, events: List[ACGEvent]) -> 'TimeGroupedEvents':
-        """从漫展活动列表创建时间分组"""
-        time_groups = {}
-        
-        for event in events:
-            # 判断活动状态
-            if event.is_ongoing:
-                time_key = "进行中"
+        """从漫展活动列表创建时间分组，进行中的排在最前，其余按日期先后排列，日期待定的排在最后"""
+        # 只读取一次当前时间，分组与天数计算使用同一时刻
+        now = time.time()
+        groups = _group_by_day(events, now)
+        today = (int(now) + _TZ_OFFSET) // 86400
+        time_groups = []
+        for day in sorted(groups):
+            if day == _ONGOING_DAY:
+                time_groups.append(TimeGroup("进行中", 0, groups[day]))
+            elif day == _UNDATED_DAY:
+                time_groups.append(TimeGroup("日期待定", 0, groups[day]))
             else:
-                time_key = event.start_time
-            
-            if time_key not in time_groups:
-                time_groups[time_key] = []
-            time_groups[time_key].append(event)
-        
+                time_groups.append(
+                    TimeGroup(_format_day(day), max(0, day - today), groups[day])
+                )
         return cls(time_groups=time_groups)
     
     def get_total_count(self) -> int:
         """获取总活动数量"""
-        return sum(len(events) for events in self.time_groups.values())
-    
-    def get_days_until_start(self, time_key: str) -> int:
-        """获取距离开始的天数"""
-        if time_key == "进行中":
-            return 0
-        
-        # 尝试解析时间
-        try:
-            # 假设时间格式为 "YYYY-MM-DD" 或 "YYYY-MM-DD HH:MM:SS"
-            if " " in time_key:
-                date_part = time_key.split(" ")[0]
-            else:
-                date_part = time_key
-            
-            target_date = datetime.strptime(date_part, "%Y-%m-%d")
-            current_date = datetime.now()
-            delta = target_date - current_date
-            return max(0, delta.days)
-        except:
-            return 0
+        return sum(len(group.events) for group in self.time_groups)
 
 
-@dataclass
+@dataclass(slots=True)
 class SearchResult:
     """搜索结果"""
     query: str
@@ -289,19 +273,26 @@ class SearchResult:
             return f"找到相关漫展 {self.total_count} 场"
 
 
-@dataclass
+@dataclass(slots=True)
 class APIResponse:
     """API响应基类"""
     success: bool
     message: str
     data: Any = None
     status_code: int = 200
+    etag: Optional[str] = None  # 用于条件请求的缓存校验信息
+    last_modified: Optional[str] = None
     
     @classmethod
     def success_response(cls, data: Any, message: str = "请求成功") -> 'APIResponse':
         """创建成功响应"""
         return cls(success=True, message=message, data=data, status_code=200)
     
+    @classmethod
+    def not_modified(cls) -> 'APIResponse':
+        """创建资源未修改响应（HTTP 304），调用方应继续使用已缓存的数据"""
+        return cls(success=False, message="资源未修改", status_code=304)
+    
     @classmethod
     def error_response(cls, message: str, status_code: int = 500) -> 'APIResponse':
         """创建错误响应"""
@@ -319,53 +310,73 @@ class APIResponse:
     @staticmethod
     def _get_error_message(status_code: int) -> str:
         """获取错误信息"""
-        error_map = {
-            400: "请求参数错误",
-            404: "资源不存在",
-            500: "服务器内部错误",
-            502: "网关错误",
-            503: "服务不可用",
-            504: "网关超时"
-        }
-        return error_map.get(status_code, f"HTTP错误 {status_code}")
+        return _ERROR_MAP.get(status_code, f"HTTP错误 {status_code}")
 
 
 # 工具函数
+@lru_cache(maxsize=256)
+def _parse_date(date_part: str) -> Optional[datetime]:
+    """解析 "YYYY-MM-DD" 格式的日期（固定格式，直接按位置切片），格式不符时返回 None"""
+    if len(date_part) < 10 or date_part[4] != "-" or date_part[7] != "-":
+        return None
+    try:
+        return datetime(int(date_part[0:4]), int(date_part[5:7]), int(date_part[8:10]))
+    except ValueError:
+        return None
+
+
 def calculate_days_until(date_str: str) -> int:
     """计算距离指定日期的天数"""
-    try:
-        if " " in date_str:
-            date_part = date_str.split(" ")[0]
-        else:
-            date_part = date_str
-        
-        target_date = datetime.strptime(date_part, "%Y-%m-%d")
-        current_date = datetime.now()
-        delta = target_date - current_date
-        return max(0, delta.days)
-    except:
+    # 时间格式为 "YYYY-MM-DD" 或 "YYYY-MM-DD HH:MM:SS"，只取日期部分
+    target_date = _parse_date(date_str[:10])
+    if target_date is None:
         return 0
+    delta = target_date - datetime.now()
+    return max(0, delta.days)
 
 
 def format_coordinate_url(coordinate: str) -> str:
     """格式化坐标为高德地图URL"""
     if not coordinate:
         return ""
-    return f"https://uri.amap.com/marker?position={coordinate}"
+    return _AMAP_PREFIX + quote(coordinate, safe=",")
+
+
+def _format_day(day: int) -> str:
+    """将自 epoch 起的天数（北京时间）格式化为 "YYYY-MM-DD" """
+    return time.strftime("%Y-%m-%d", time.gmtime(day * 86400))
+
+
+def _event_day(event: ACGEvent, now: float) -> int:
+    """获取活动所属的分组 key（自 epoch 起的天数，北京时间）"""
+    if event.start_unix:
+        if event.start_unix <= now <= event.end_unix:
+            return _ONGOING_DAY
+        return (event.start_unix + _TZ_OFFSET) // 86400
+    
+    # 缺少时间戳时退回解析 start_time 字符串
+    start_date = _parse_date((event.start_time or "")[:10])
+    if start_date is None:
+        return _UNDATED_DAY
+    return start_date.toordinal() - _EPOCH_ORDINAL
+
+
+def _group_by_day(events: List[ACGEvent], now: float) -> Dict[int, List[ACGEvent]]:
+    """按开始日期分组漫展活动，key 为自 epoch 起的天数，进行中为 -1，日期待定排在最后"""
+    groups: Dict[int, List[ACGEvent]] = defaultdict(list)
+    for event in events:
+        groups[_event_day(event, now)].append(event)
+    return groups
 
 
 def group_events_by_time(events: List[ACGEvent]) -> Dict[str, List[ACGEvent]]:
     """按时间分组漫展活动"""
-    groups = {}
+    groups: Dict[str, List[ACGEvent]] = defaultdict(list)
+    now = time.time()
     
     for event in events:
-        if event.is_ongoing:
-            time_key = "进行中"
-        else:
-            time_key = event.start_time
-        
-        if time_key not in groups:
-            groups[time_key] = []
+        # 进行中的活动归为一组，其余按开始时间分组
+        time_key = "进行中" if event.start_unix <= now <= event.end_unix else event.start_time
         groups[time_key].append(event)
     
     return groups
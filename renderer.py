@@ -1,26 +1,136 @@
 """
 ACGalaxy 图片渲染器
 """
-import json
+import asyncio
+import math
 import os
+import re
+from html import escape
 from pathlib import Path
-from typing import List, Dict, Any, Optional
+from typing import List, Dict
+
 from playwright.async_api import async_playwright
 from astrbot.api import logger
 
-from .models import ACGEvent, Guest, TimeGroupedEvents, SearchResult
+from .models import ACGEvent, Guest, TimeGroupedEvents
+
+# 渲染使用的模板文件
+TEMPLATE_NAMES = ("acg_list.html", "acg_list_times.html", "acg_list_guest.html")
+
+# 仅用于截图的无头浏览器，关闭不需要的功能
+_BROWSER_ARGS = [
+    "--no-sandbox",
+    "--disable-gpu",
+    "--disable-dev-shm-usage",
+    "--disable-extensions",
+    "--disable-background-networking",
+    "--disable-sync",
+    "--no-first-run",
+    "--disable-features=Translate,BackForwardCache",
+]
+
+# 截图 JPEG 质量
+_JPEG_QUALITY = 85
+
+# 获取元素在页面中的位置尺寸
+_BBOX_JS = """(selector) => {
+    const r = document.querySelector(selector).getBoundingClientRect();
+    return {x: r.x, y: r.y, width: r.width, height: r.height};
+}"""
+
+# 模板占位符，形如 @@events_html@@
+_PLACEHOLDER_RE = re.compile(r"@@(\w+)@@")
+
+
+def _event_card_html(event: ACGEvent) -> str:
+    """生成单个漫展卡片的HTML"""
+    # 价格与NPC状态文本直接复用模型属性，与文本回复保持一致
+    badge_class = "npc-badge" if event.has_npc == 1 else "no-npc-badge"
+    return (
+        '<div class="event-card">'
+        f'<div class="event-title">{escape(event.project_name or "")}</div>'
+        f'<div class="event-time">📅 {escape(event.start_time or "")} - {escape(event.end_time or "")}</div>'
+        f'<div class="event-location">📍 {escape(event.city or "")} - {escape(event.venue_name or "")}</div>'
+        f'<div class="event-price">💰 {event.price_range_yuan}</div>'
+        f'<div class="event-meta"><span class="{badge_class}">{event.has_npc_text}</span>'
+        f'<span style="margin-left: 10px;">❤️ {event.like_count}</span>'
+        f'<span style="margin-left: 10px;">ID: {escape(event.id)}</span>'
+        '</div>'
+        '</div>'
+    )
 
 
 class ACGalaxyImageRenderer:
     """ACGalaxy 图片渲染器"""
     
-    def __init__(self, width: int = 625, device_scale_factor: float = 1.0):
+    def __init__(
+        self, width: int = 625, device_scale_factor: float = 1.0, pool_size: int = 2
+    ):
         self.width = width
         self.device_scale_factor = device_scale_factor
+        self.pool_size = max(1, pool_size)
         self.templates_dir = Path(__file__).parent / "templates"
         
         # 确保模板目录存在
         self.templates_dir.mkdir(exist_ok=True)
+        
+        # 按占位符预先切分的模板缓存，模板文件在运行期间不会变化
+        # 切分结果中奇数位置为占位符名称，其余为原样输出的文本
+        self._template_cache: Dict[str, List[str]] = {}
+        for template_name in TEMPLATE_NAMES:
+            self._load_template(template_name)
+        
+        # 复用的浏览器实例，首次渲染时启动
+        self._playwright = None
+        self._browser = None
+        self._browser_lock = asyncio.Lock()
+        # 预先创建的浏览器上下文池，并发渲染各自占用一个上下文
+        self._context_pool: asyncio.Queue = asyncio.Queue()
+    
+    async def _ensure_browser(self):
+        """确保浏览器已启动，未启动或已断开时重新启动并填充上下文池"""
+        async with self._browser_lock:
+            if self._browser is not None and self._browser.is_connected():
+                return
+            if self._playwright is None:
+                self._playwright = await async_playwright().start()
+            self._browser = await self._playwright.chromium.launch(
+                args=_BROWSER_ARGS
+            )
+            # 丢弃属于旧浏览器的上下文
+            while not self._context_pool.empty():
+                self._context_pool.get_nowait()
+            for _ in range(self.pool_size):
+                # 模板为纯静态HTML，无需脚本、网络与 Service Worker
+                context = await self._browser.new_context(
+                    viewport={"width": self.width, "height": 1200},
+                    device_scale_factor=self.device_scale_factor,
+                    java_script_enabled=False,
+                    service_workers="block",
+                    offline=True,
+                )
+                self._context_pool.put_nowait(context)
+    
+    def _release_context(self, context):
+        """归还上下文，浏览器已关闭或重启时直接丢弃"""
+        browser = self._browser
+        if context.browser is browser and browser.is_connected():
+            self._context_pool.put_nowait(context)
+    
+    async def close(self):
+        """关闭浏览器"""
+        async with self._browser_lock:
+            while not self._context_pool.empty():
+                self._context_pool.get_nowait()
+            if self._browser is not None:
+                try:
+                    await self._browser.close()
+                except Exception as e:
+                    logger.warning(f"关闭浏览器失败: {e}")
+                self._browser = None
+            if self._playwright is not None:
+                await self._playwright.stop()
+                self._playwright = None
     
     async def _capture_element_screenshot(
         self, 
@@ -29,30 +139,39 @@ class ACGalaxyImageRenderer:
     ) -> bytes:
         """截取HTML元素的屏幕截图"""
         try:
-            async with async_playwright() as p:
-                browser = await p.chromium.launch(args=["--no-sandbox"])
-                page = await browser.new_page(device_scale_factor=self.device_scale_factor)
-                await page.set_viewport_size({"width": self.width, "height": 1200})
+            await self._ensure_browser()
+            context = await self._context_pool.get()
+            page = None
+            try:
+                page = await context.new_page()
                 
-                # 设置页面内容
+                # 设置页面内容（等待 load 事件）
                 await page.set_content(html_content)
                 
-                # 等待页面渲染完成
-                await page.wait_for_timeout(1000)
-                
-                # 截取指定元素的截图
-                element = page.locator(element_selector)
-                screenshot = await element.screenshot()
-                
-                await browser.close()
-                return screenshot
+                # 一次取得目标元素的位置尺寸，按内容高度调整视口后直接截取页面区域
+                bbox = await page.evaluate(_BBOX_JS, element_selector)
+                await page.set_viewport_size(
+                    {"width": self.width, "height": math.ceil(bbox["y"] + bbox["height"])}
+                )
+                # 卡片类页面用 JPEG 输出，体积远小于无损 PNG
+                return await page.screenshot(
+                    clip=bbox, type="jpeg", quality=_JPEG_QUALITY
+                )
+            finally:
+                if page is not None:
+                    await page.close()
+                self._release_context(context)
                 
         except Exception as e:
             logger.error(f"截取屏幕截图失败: {e}")
             raise
     
-    def _load_template(self, template_name: str) -> str:
-        """加载HTML模板"""
+    def _load_template(self, template_name: str) -> List[str]:
+        """加载HTML模板，返回按占位符切分后的片段"""
+        cached = self._template_cache.get(template_name)
+        if cached is not None:
+            return cached
+        
         template_path = self.templates_dir / template_name
         if not template_path.exists():
             # 如果模板不存在，创建默认模板
@@ -60,10 +179,20 @@ class ACGalaxyImageRenderer:
         
         try:
             with open(template_path, "r", encoding="utf-8") as f:
-                return f.read()
+                template = f.read()
+            parts = _PLACEHOLDER_RE.split(template)
+            self._template_cache[template_name] = parts
+            return parts
         except Exception as e:
             logger.error(f"加载模板失败: {e}")
-            return self._get_fallback_template()
+            return [self._get_fallback_template()]
+    
+    def _fill_template(self, template_name: str, **values: str) -> str:
+        """将数据填入模板占位符，一次拼接生成完整HTML"""
+        parts = self._load_template(template_name)
+        return "".join(
+            [values[part] if i % 2 else part for i, part in enumerate(parts)]
+        )
     
     def _get_fallback_template(self) -> str:
         """获取备用模板"""
@@ -93,7 +222,7 @@ class ACGalaxyImageRenderer:
         """
     
     def _create_default_templates(self):
-        """创建默认模板文件"""
+        """创建缺失的默认模板文件，已存在的模板不会被覆盖"""
         # 创建漫展列表模板
         acg_list_template = """
         <!DOCTYPE html>
@@ -126,36 +255,9 @@ class ACGalaxyImageRenderer:
                     发送 "漫展位置 展会id" 查看位置信息
                 </div>
                 <div id="events">
-                    <!-- 漫展列表将在这里渲染 -->
+                    @@events_html@@
                 </div>
             </div>
-            <script>
-                const events = @@acg_list@@;
-                const container = document.getElementById('events');
-                
-                events.forEach(event => {
-                    const card = document.createElement('div');
-                    card.className = 'event-card';
-                    
-                    const npcBadge = event.has_npc === 1 
-                        ? '<span class="npc-badge">有NPC招募</span>'
-                        : '<span class="no-npc-badge">无NPC招募</span>';
-                    
-                    card.innerHTML = `
-                        <div class="event-title">${event.project_name}</div>
-                        <div class="event-time">📅 ${event.start_time} - ${event.end_time}</div>
-                        <div class="event-location">📍 ${event.city} - ${event.venue_name}</div>
-                        <div class="event-price">💰 ￥${event.min_price/100} - ${event.max_price/100}</div>
-                        <div class="event-meta">
-                            ${npcBadge}
-                            <span style="margin-left: 10px;">❤️ ${event.like_count}</span>
-                            <span style="margin-left: 10px;">ID: ${event.id}</span>
-                        </div>
-                    `;
-                    
-                    container.appendChild(card);
-                });
-            </script>
         </body>
         </html>
         """
@@ -194,68 +296,9 @@ class ACGalaxyImageRenderer:
                     发送 "漫展位置 展会id" 查看位置信息
                 </div>
                 <div id="time-groups">
-                    <!-- 时间分组将在这里渲染 -->
+                    @@events_html@@
                 </div>
             </div>
-            <script>
-                const timeGroups = @@acg_list@@;
-                const container = document.getElementById('time-groups');
-                
-                function calculateDaysUntil(dateStr) {
-                    if (dateStr === '进行中') return 0;
-                    try {
-                        const targetDate = new Date(dateStr.split(' ')[0]);
-                        const currentDate = new Date();
-                        const diffTime = targetDate - currentDate;
-                        const diffDays = Math.ceil(diffTime / (1000 * 60 * 60 * 24));
-                        return Math.max(0, diffDays);
-                    } catch {
-                        return 0;
-                    }
-                }
-                
-                Object.keys(timeGroups).forEach(timeKey => {
-                    const events = timeGroups[timeKey];
-                    const daysUntil = calculateDaysUntil(timeKey);
-                    
-                    const groupDiv = document.createElement('div');
-                    groupDiv.className = 'time-group';
-                    
-                    const headerDiv = document.createElement('div');
-                    headerDiv.className = 'time-header';
-                    headerDiv.textContent = `${timeKey} 共 ${events.length} 场`;
-                    if (daysUntil > 0) {
-                        headerDiv.textContent += ` (距离开始还有 ${daysUntil} 天)`;
-                    }
-                    
-                    groupDiv.appendChild(headerDiv);
-                    
-                    events.forEach(event => {
-                        const card = document.createElement('div');
-                        card.className = 'event-card';
-                        
-                        const npcBadge = event.has_npc === 1 
-                            ? '<span class="npc-badge">有NPC招募</span>'
-                            : '<span class="no-npc-badge">无NPC招募</span>';
-                        
-                        card.innerHTML = `
-                            <div class="event-title">${event.project_name}</div>
-                            <div class="event-time">📅 ${event.start_time} - ${event.end_time}</div>
-                            <div class="event-location">📍 ${event.city} - ${event.venue_name}</div>
-                            <div class="event-price">💰 ￥${event.min_price/100} - ${event.max_price/100}</div>
-                            <div class="event-meta">
-                                ${npcBadge}
-                                <span style="margin-left: 10px;">❤️ ${event.like_count}</span>
-                                <span style="margin-left: 10px;">ID: ${event.id}</span>
-                            </div>
-                        `;
-                        
-                        groupDiv.appendChild(card);
-                    });
-                    
-                    container.appendChild(groupDiv);
-                });
-            </script>
         </body>
         </html>
         """
@@ -296,66 +339,9 @@ class ACGalaxyImageRenderer:
                     发送 "漫展位置 展会id" 查看位置信息
                 </div>
                 <div id="content">
-                    <!-- 内容将在这里渲染 -->
+                    @@events_html@@
                 </div>
             </div>
-            <script>
-                const events = @@acg_list@@;
-                const guests = @@guest_list@@;
-                const container = document.getElementById('content');
-                
-                // 按嘉宾分组事件
-                const eventsByGuest = {};
-                events.forEach(event => {
-                    const guestId = event.guest ? event.guest.id : 'unknown';
-                    if (!eventsByGuest[guestId]) {
-                        eventsByGuest[guestId] = [];
-                    }
-                    eventsByGuest[guestId].push(event);
-                });
-                
-                // 渲染每个嘉宾的相关漫展
-                guests.forEach(guest => {
-                    const guestEvents = eventsByGuest[guest.id] || [];
-                    
-                    const sectionDiv = document.createElement('div');
-                    sectionDiv.className = 'guest-section';
-                    
-                    const headerDiv = document.createElement('div');
-                    headerDiv.className = 'guest-header';
-                    headerDiv.innerHTML = `
-                        <div class="guest-name">${guest.name}</div>
-                        <div class="guest-desc">${guest.description || '暂无描述'}</div>
-                    `;
-                    
-                    sectionDiv.appendChild(headerDiv);
-                    
-                    guestEvents.forEach(event => {
-                        const card = document.createElement('div');
-                        card.className = 'event-card';
-                        
-                        const npcBadge = event.has_npc === 1 
-                            ? '<span class="npc-badge">有NPC招募</span>'
-                            : '<span class="no-npc-badge">无NPC招募</span>';
-                        
-                        card.innerHTML = `
-                            <div class="event-title">${event.project_name}</div>
-                            <div class="event-time">📅 ${event.start_time} - ${event.end_time}</div>
-                            <div class="event-location">📍 ${event.city} - ${event.venue_name}</div>
-                            <div class="event-price">💰 ￥${event.min_price/100} - ${event.max_price/100}</div>
-                            <div class="event-meta">
-                                ${npcBadge}
-                                <span style="margin-left: 10px;">❤️ ${event.like_count}</span>
-                                <span style="margin-left: 10px;">ID: ${event.id}</span>
-                            </div>
-                        `;
-                        
-                        sectionDiv.appendChild(card);
-                    });
-                    
-                    container.appendChild(sectionDiv);
-                });
-            </script>
         </body>
         </html>
         """
@@ -369,6 +355,8 @@ class ACGalaxyImageRenderer:
         
         for filename, content in templates.items():
             template_path = self.templates_dir / filename
+            if template_path.exists():
+                continue
             try:
                 with open(template_path, "w", encoding="utf-8") as f:
                     f.write(content)
@@ -379,13 +367,9 @@ class ACGalaxyImageRenderer:
     async def render_acg_list(self, events: List[ACGEvent]) -> bytes:
         """渲染漫展列表"""
         try:
-            template = self._load_template("acg_list.html")
-            
-            # 将事件列表转换为字典列表
-            events_data = [event.__dict__ for event in events]
-            
-            # 替换模板中的数据
-            html_content = template.replace("@@acg_list@@", json.dumps(events_data, ensure_ascii=False))
+            card = _event_card_html
+            events_html = "".join([card(event) for event in events])
+            html_content = self._fill_template("acg_list.html", events_html=events_html)
             
             return await self._capture_element_screenshot(html_content)
             
@@ -396,15 +380,23 @@ class ACGalaxyImageRenderer:
     async def render_acg_calendar(self, time_grouped_events: TimeGroupedEvents) -> bytes:
         """渲染漫展日历（按时间分组）"""
         try:
-            template = self._load_template("acg_list_times.html")
-            
-            # 将时间分组转换为字典
-            time_groups_data = {}
-            for time_key, events in time_grouped_events.time_groups.items():
-                time_groups_data[time_key] = [event.__dict__ for event in events]
+            card = _event_card_html
+            groups_html = []
+            for group in time_grouped_events.time_groups:
+                header = f"{group.label} 共 {len(group.events)} 场"
+                if group.days_until > 0:
+                    header += f" (距离开始还有 {group.days_until} 天)"
+                
+                groups_html.append(
+                    '<div class="time-group">'
+                    f'<div class="time-header">{header}</div>'
+                    + "".join([card(event) for event in group.events])
+                    + '</div>'
+                )
             
-            # 替换模板中的数据
-            html_content = template.replace("@@acg_list@@", json.dumps(time_groups_data, ensure_ascii=False))
+            html_content = self._fill_template(
+                "acg_list_times.html", events_html="".join(groups_html)
+            )
             
             return await self._capture_element_screenshot(html_content)
             
@@ -412,17 +404,28 @@ class ACGalaxyImageRenderer:
             logger.error(f"渲染漫展日历失败: {e}")
             raise
     
-    async def render_guest_events(self, guests: List[Guest], events: List[Dict[str, Any]]) -> bytes:
+    async def render_guest_events(
+        self, guests: List[Guest], events_by_guest_id: Dict[str, List[ACGEvent]]
+    ) -> bytes:
         """渲染嘉宾相关漫展"""
         try:
-            template = self._load_template("acg_list_guest.html")
-            
-            # 转换数据
-            guests_data = [guest.__dict__ for guest in guests]
+            card = _event_card_html
+            sections_html = []
+            for guest in guests:
+                guest_events = events_by_guest_id.get(guest.id, ())
+                sections_html.append(
+                    '<div class="guest-section">'
+                    '<div class="guest-header">'
+                    f'<div class="guest-name">{escape(guest.name or "")}</div>'
+                    f'<div class="guest-desc">{escape(guest.description or "暂无描述")}</div>'
+                    '</div>'
+                    + "".join([card(event) for event in guest_events])
+                    + '</div>'
+                )
             
-            # 替换模板中的数据
-            html_content = template.replace("@@guest_list@@", json.dumps(guests_data, ensure_ascii=False))
-            html_content = html_content.replace("@@acg_list@@", json.dumps(events, ensure_ascii=False))
+            html_content = self._fill_template(
+                "acg_list_guest.html", events_html="".join(sections_html)
+            )
             
             return await self._capture_element_screenshot(html_content)
             